@@ -1,4 +1,4 @@
-# flight_api_production.py
+# flight_api.py
 """
 Production-Ready Flight Booking Backend (FastAPI + SQLite)
 Improvements:
@@ -17,6 +17,11 @@ Improvements:
 """
 
 import os
+import asyncio
+import time
+import hashlib
+import base64
+import json
 import sqlite3
 import uuid
 import secrets
@@ -24,23 +29,32 @@ import random
 import atexit
 import re
 import logging
+import queue
+import threading
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from functools import wraps
+from functools import wraps, lru_cache
+from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, status, Query, Depends, Header, Request
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, status, Query, Depends, Header, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
+from anyio import to_thread
 from pydantic import BaseModel, EmailStr, validator, Field
 from pydantic_settings import BaseSettings
 from passlib.context import CryptContext
-from jose import JWTError, jwt
+import jwt
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
+from cachetools import TTLCache
 
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
@@ -59,6 +73,18 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
     
+    # Password hashing cost (each +1 doubles bcrypt CPU time per login/register)
+    bcrypt_rounds: int = 11
+    
+    # Directory for rendered ticket / receipt PDFs
+    tickets_dir: str = "tickets"
+    
+    # Run background jobs (cleanup, demand updates) in this process
+    run_scheduler: bool = True
+    
+    # Database connection pool (number of reader connections)
+    db_pool_size: int = (os.cpu_count() or 4) * 2
+    
     # CORS settings
     cors_origins: List[str] = ["http://localhost:3000", "http://localhost:5173"]
     
@@ -84,14 +110,27 @@ logger = logging.getLogger(__name__)
 # ---------------------------
 # Security
 # ---------------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 security = HTTPBearer()
 
+# bcrypt only uses the first 72 bytes of a password
+BCRYPT_MAX_BYTES = 72
+
+def _bcrypt_secret(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return pwd_context.hash(_bcrypt_secret(password))
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context.verify(_bcrypt_secret(plain_password), hashed_password)
+
+# Verified against when the username does not exist, so unknown users take
+# as long to reject as wrong passwords. Hashing and verifying it at import also
+# resolves passlib's bcrypt backend up front, so each worker pays for backend
+# detection once when it imports the module rather than on its first login.
+DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16))
+verify_password("warmup", DUMMY_PASSWORD_HASH)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -112,44 +151,111 @@ def decode_token(token: str):
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         return payload
-    except JWTError as e:
+    except jwt.PyJWTError as e:
         logger.warning(f"JWT decode error: {e}")
         return None
 
 # ---------------------------
 # Database Connection Pool
 # ---------------------------
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA wal_autocheckpoint = 1000",
+    "PRAGMA foreign_keys = ON",
+)
+
+class ConnectionPool:
+    """Pre-opened SQLite connections: N readers plus one lock-guarded writer"""
+
+    def __init__(self, database: str, readers: int):
+        self.database = database
+        # All connections run in autocommit mode; callers open write
+        # transactions explicitly with BEGIN IMMEDIATE so the lock is taken upfront.
+        self._writer = self._connect(database)
+        self._writer_lock = threading.Lock()
+        # Readers are opened read-only; under WAL they never block the writer.
+        reader_uri = f"{Path(database).resolve().as_uri()}?mode=ro"
+        self._readers = queue.Queue(maxsize=readers)
+        for _ in range(readers):
+            self._readers.put(self._connect(reader_uri, uri=True))
+
+    def _connect(self, database: str, **kwargs) -> sqlite3.Connection:
+        # cached_statements is sized to hold every search_flights variant
+        # alongside the static module-level statements
+        conn = sqlite3.connect(database, timeout=10, check_same_thread=False,
+                               isolation_level=None, cached_statements=256, **kwargs)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        # Resolved at call time; defined with the pricing helpers below
+        conn.create_function("flight_price", 6, lambda *args: cached_flight_price(*args))
+        return conn
+
+    def acquire_reader(self) -> sqlite3.Connection:
+        return self._readers.get()
+
+    def release_reader(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._readers.put(conn)
+
+    def acquire_writer(self) -> sqlite3.Connection:
+        self._writer_lock.acquire()
+        return self._writer
+
+    def release_writer(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        finally:
+            self._writer_lock.release()
+
+    def close(self):
+        with self._writer_lock:
+            # Refresh planner stats the session showed to be stale (readers
+            # are read-only, so the writer does this for the whole database)
+            try:
+                self._writer.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.warning(f"PRAGMA optimize failed: {e}")
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+db_pool = ConnectionPool(settings.database_url, settings.db_pool_size)
+atexit.register(db_pool.close)
+
 @contextmanager
-def get_db():
-    conn = sqlite3.connect(settings.database_url, timeout=10)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    conn.execute("PRAGMA journal_mode = WAL")
+def get_read_db():
+    conn = db_pool.acquire_reader()
     try:
         yield conn
     except Exception as e:
-        conn.rollback()
         logger.error(f"Database error: {e}")
         raise
     finally:
-        conn.close()
+        db_pool.release_reader(conn)
 
-def with_retry(func, max_attempts=3):
-    """Retry database operations on lock"""
-    for attempt in range(max_attempts):
-        try:
-            return func()
-        except sqlite3.OperationalError as e:
-            if "locked" in str(e).lower() and attempt < max_attempts - 1:
-                import time
-                time.sleep(0.1 * (2 ** attempt))
-                logger.warning(f"Database locked, retry {attempt + 1}/{max_attempts}")
-                continue
-            raise
+@contextmanager
+def get_write_db():
+    conn = db_pool.acquire_writer()
+    try:
+        yield conn
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Database error: {e}")
+        raise
+    finally:
+        db_pool.release_writer(conn)
 
 def init_schema():
     """Initialize database schema with improvements"""
-    with get_db() as conn:
+    with get_write_db() as conn:
         cur = conn.cursor()
         cur.executescript("""
         PRAGMA journal_mode = WAL;
@@ -201,6 +307,8 @@ def init_schema():
         CREATE INDEX IF NOT EXISTS idx_flight_departure ON flight(departure_time);
         CREATE INDEX IF NOT EXISTS idx_flight_route ON flight(from_airport_code, to_airport_code);
         CREATE INDEX IF NOT EXISTS idx_flight_number ON flight(flight_number);
+        CREATE INDEX IF NOT EXISTS idx_flight_status_departure ON flight(status, departure_time) WHERE status = 'SCHEDULED';
+        CREATE INDEX IF NOT EXISTS idx_flight_search ON flight(status, from_airport_code, to_airport_code, departure_time) WHERE seats_remaining > 0;
 
         CREATE TABLE IF NOT EXISTS booking (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -215,13 +323,22 @@ def init_schema():
             contact_phone VARCHAR(30) NOT NULL,
             cancellation_date DATETIME,
             refund_amount REAL,
+            passenger_count INTEGER,
             FOREIGN KEY (user_id) REFERENCES user(id),
             FOREIGN KEY (flight_id) REFERENCES flight(id)
         );
 
-        CREATE INDEX IF NOT EXISTS idx_booking_user ON booking(user_id);
-        CREATE INDEX IF NOT EXISTS idx_booking_pnr ON booking(pnr);
-        CREATE INDEX IF NOT EXISTS idx_booking_status ON booking(status);
+        DROP INDEX IF EXISTS idx_booking_user;
+        DROP INDEX IF EXISTS idx_booking_user_date;
+        CREATE INDEX IF NOT EXISTS idx_booking_user_date_id ON booking(user_id, booking_date DESC, id DESC);
+        -- pnr lookups use the UNIQUE constraint's autoindex; PENDING cleanup
+        -- and the CONFIRMED stats use idx_booking_status_date
+        DROP INDEX IF EXISTS idx_booking_pnr;
+        DROP INDEX IF EXISTS idx_booking_status;
+        DROP INDEX IF EXISTS idx_booking_pending_cleanup;
+        DROP INDEX IF EXISTS idx_booking_confirmed;
+        CREATE INDEX IF NOT EXISTS idx_booking_date ON booking(booking_date DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_booking_status_date ON booking(status, booking_date DESC, id DESC);
 
         CREATE TABLE IF NOT EXISTS passenger (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -281,12 +398,31 @@ def init_schema():
 
         -- Trigger removed - pricing logic moved to application layer for better control
         """)
+        
+        # Migrate databases created before booking.passenger_count existed.
+        # Checked under the write lock: every worker runs this on import.
+        cur.execute("BEGIN IMMEDIATE")
+        columns = {row["name"] for row in cur.execute("PRAGMA table_info(booking)")}
+        if "passenger_count" not in columns:
+            cur.execute("ALTER TABLE booking ADD COLUMN passenger_count INTEGER")
+            cur.execute("""
+                UPDATE booking SET passenger_count = (
+                    SELECT COUNT(*) FROM passenger WHERE passenger.booking_id = booking.id
+                )
+            """)
+            logger.info("Added booking.passenger_count")
         conn.commit()
         logger.info("Database schema initialized successfully")
 
 # ---------------------------
 # Models with Validation
 # ---------------------------
+_USERNAME_RE = re.compile(r'^[a-zA-Z0-9_-]+$')
+_PHONE_RE = re.compile(r'^\+?[1-9]\d{9,14}$')
+_SEAT_RE = re.compile(r'^\d{1,2}[A-F]$')
+_NAME_RE = re.compile(r'^[a-zA-Z\s\'-]+$')
+_FLIGHTNO_RE = re.compile(r'^[A-Z0-9]+$')
+
 class UserRegister(BaseModel):
     username: str = Field(..., min_length=3, max_length=50)
     password: str = Field(..., min_length=8)
@@ -297,13 +433,13 @@ class UserRegister(BaseModel):
 
     @validator('username')
     def validate_username(cls, v):
-        if not re.match(r'^[a-zA-Z0-9_-]+$', v):
+        if not _USERNAME_RE.match(v):
             raise ValueError('Username can only contain letters, numbers, underscore and hyphen')
         return v.lower()
 
     @validator('phone')
     def validate_phone(cls, v):
-        if v and not re.match(r'^\+?[1-9]\d{9,14}$', v):
+        if v and not _PHONE_RE.match(v):
             raise ValueError('Invalid phone number format')
         return v
 
@@ -322,7 +458,7 @@ class PassengerIn(BaseModel):
     @validator('seat_number')
     def validate_seat(cls, v):
         v = v.strip().upper()
-        if not re.match(r'^\d{1,2}[A-F]$', v):
+        if not _SEAT_RE.match(v):
             raise ValueError('Invalid seat format. Use format like: 12A, 5B')
         return v
 
@@ -331,7 +467,7 @@ class PassengerIn(BaseModel):
         v = v.strip()
         if len(v) < 2:
             raise ValueError('Name must be at least 2 characters')
-        if not re.match(r'^[a-zA-Z\s\'-]+$', v):
+        if not _NAME_RE.match(v):
             raise ValueError('Name can only contain letters, spaces, hyphens and apostrophes')
         return v
 
@@ -345,7 +481,7 @@ class BookingRequest(BaseModel):
 
     @validator('contact_phone')
     def validate_phone(cls, v):
-        if not re.match(r'^\+?[1-9]\d{9,14}$', v):
+        if not _PHONE_RE.match(v):
             raise ValueError('Invalid phone number')
         return v
 
@@ -361,7 +497,7 @@ class FlightCreate(BaseModel):
 
     @validator('flight_number')
     def validate_flight_number(cls, v):
-        if not re.match(r'^[A-Z0-9]+$', v.upper()):
+        if not _FLIGHTNO_RE.match(v.upper()):
             raise ValueError('Flight number must be alphanumeric')
         return v.upper()
 
@@ -372,7 +508,7 @@ class FlightCreate(BaseModel):
     @validator('departure_time', 'arrival_time')
     def validate_datetime(cls, v):
         try:
-            dt = datetime.fromisoformat(v.replace('Z', '+00:00'))
+            dt = _parse_dt(v.replace('Z', '+00:00'))
             if dt < datetime.now():
                 raise ValueError('Date cannot be in the past')
             return v
@@ -391,7 +527,8 @@ class TokenResponse(BaseModel):
 app = FastAPI(
     title="Flight Booking System - Production",
     description="Complete flight booking backend with enterprise features",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Rate Limiting
@@ -408,47 +545,188 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# SQLite retries lock acquisition itself for busy_timeout ms; anything still
+# locked after that is surfaced to the client as a retryable 503
+@app.exception_handler(sqlite3.OperationalError)
+async def database_error_handler(request: Request, exc: sqlite3.OperationalError):
+    if "locked" in str(exc).lower():
+        logger.warning(f"Database busy: {exc}")
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": "Database busy, please retry"},
+            headers={"Retry-After": "1"},
+        )
+    logger.error(f"Database error: {exc}")
+    return JSONResponse(status_code=500, content={"detail": "Internal database error"})
+
 # Initialize DB
 init_schema()
 
+@app.on_event("startup")
+def load_airport_cache():
+    load_airports()
+
+@app.on_event("startup")
+async def configure_threadpool():
+    """Size the worker threadpool used for password hashing to the CPU count"""
+    to_thread.current_default_thread_limiter().total_tokens = os.cpu_count() or 1
+
+# ---------------------------
+# SQL Statements (module-level so pooled connections reuse cached statements)
+# ---------------------------
+SQL_INSERT_BOOKING = """
+    INSERT INTO booking 
+    (user_id, flight_id, pnr, price_paid, contact_email, contact_phone, passenger_count, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, 'PENDING')
+"""
+
+SQL_INSERT_PASSENGER = """
+    INSERT INTO passenger 
+    (booking_id, flight_id, seat_number, seat_type, full_name, 
+     date_of_birth, passport_number, passenger_type)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_INSERT_PAYMENT = """
+    INSERT INTO payment 
+    (booking_id, payment_reference, payment_method, amount_paid, payment_status)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
 # ---------------------------
 # Helper Functions
 # ---------------------------
+@lru_cache(maxsize=4096)
+def _parse_dt(value: str) -> datetime:
+    """Parse an ISO datetime string; flights share few distinct departure times"""
+    return datetime.fromisoformat(value)
+
+@lru_cache(maxsize=10_000)
+def _parse_iso(value: str) -> float:
+    """Parse an ISO datetime string (as stored in the flight table) to a Unix epoch"""
+    return _parse_dt(value).timestamp()
+
+# Seat availability factor: (upper bound of % seats remaining, increase)
+_SEAT_THRESHOLDS = (0.05, 0.10, 0.20, 0.50)
+_SEAT_FACTORS = (0.60, 0.40, 0.20, 0.10, 0.0)
+
+# Time-based factor (closer to departure = higher price): hours until departure
+_TIME_THRESHOLDS = (0, 6, 24, 72)
+_TIME_FACTORS = (0, 0.30, 0.20, 0.10, 0.05)
+
+# Every time threshold is a multiple of this, so the time factor is constant
+# within a bucket and prices can be memoized per bucket
+_PRICE_BUCKET_SECONDS = 6 * 3600
+
+PRICE_CACHE = TTLCache(maxsize=10_000, ttl=60)
+PRICE_CACHE_LOCK = threading.Lock()
+
 def calculate_dynamic_price(base_price: float, seats_remaining: int, total_seats: int, 
-                           demand_factor: float, departure_time: datetime) -> float:
+                           demand_factor: float, departure_ts: float) -> float:
     """Calculate dynamic price based on availability and time"""
     if total_seats <= 0:
         total_seats = 1
     
-    # Seat availability factor
-    remaining_percentage = seats_remaining / total_seats
-    if remaining_percentage <= 0.05:
-        seat_factor = 0.60  # 60% increase
-    elif remaining_percentage <= 0.10:
-        seat_factor = 0.40  # 40% increase
-    elif remaining_percentage <= 0.20:
-        seat_factor = 0.20  # 20% increase
-    elif remaining_percentage <= 0.50:
-        seat_factor = 0.10  # 10% increase
-    else:
-        seat_factor = 0.0
-    
-    # Time-based factor (closer to departure = higher price)
-    hours_until_departure = (departure_time - datetime.now()).total_seconds() / 3600
-    if hours_until_departure < 0:
-        time_factor = 0
-    elif hours_until_departure < 6:
-        time_factor = 0.30
-    elif hours_until_departure < 24:
-        time_factor = 0.20
-    elif hours_until_departure < 72:
-        time_factor = 0.10
-    else:
-        time_factor = 0.05
+    seat_factor = _SEAT_FACTORS[bisect_left(_SEAT_THRESHOLDS, seats_remaining / total_seats)]
+    
+    hours_until_departure = (departure_ts - time.time()) / 3600
+    time_factor = _TIME_FACTORS[bisect_right(_TIME_THRESHOLDS, hours_until_departure)]
     
     final_price = base_price * (1 + seat_factor + time_factor) * demand_factor
     return round(final_price, 2)
 
+def cached_flight_price(flight_id: int, base_price: float, seats_remaining: int, total_seats: int,
+                        demand_factor: float, departure_time: str) -> float:
+    """calculate_dynamic_price for a flight, memoized per pricing inputs and time bucket.
+    
+    Also registered on every pooled connection as the SQL function flight_price().
+    """
+    departure_ts = _parse_iso(departure_time)
+    key = (
+        flight_id, base_price, seats_remaining, total_seats, demand_factor,
+        (departure_ts - time.time()) // _PRICE_BUCKET_SECONDS
+    )
+    with PRICE_CACHE_LOCK:
+        price = PRICE_CACHE.get(key)
+    if price is None:
+        price = calculate_dynamic_price(base_price, seats_remaining, total_seats, demand_factor, departure_ts)
+        with PRICE_CACHE_LOCK:
+            PRICE_CACHE[key] = price
+    return price
+
+# SQL expression for a flight row's current price (see cached_flight_price)
+SQL_FLIGHT_PRICE = (
+    "flight_price(f.id, f.base_price, f.seats_remaining, f.total_seats, "
+    "f.demand_factor, f.departure_time)"
+)
+
+SQL_GET_FLIGHT = f"""
+    SELECT f.*, {SQL_FLIGHT_PRICE} as current_price
+    FROM flight f
+    WHERE f.id = ?
+"""
+
+SQL_GET_BOOKING_BY_PNR = """
+    SELECT b.*, f.flight_number, f.airline, f.departure_time, f.arrival_time,
+           f.from_airport_code, f.to_airport_code
+    FROM booking b
+    JOIN flight f ON f.id = b.flight_id
+    WHERE b.pnr = ?
+"""
+
+SQL_SEARCH_FLIGHTS_BASE = f"""
+    SELECT f.id, f.flight_number, f.airline, f.from_airport_code, f.to_airport_code,
+           f.departure_time, f.arrival_time, f.base_price, f.seats_remaining,
+           f.total_seats, f.demand_factor, {SQL_FLIGHT_PRICE} as current_price
+    FROM flight f
+    WHERE f.status = 'SCHEDULED' AND f.seats_remaining > 0
+      AND f.departure_time > datetime('now')
+"""
+
+# airport_lookup is a static dimension table: keep it in-process instead of
+# JOINing it into every flight/booking query. Unlike the old INNER JOINs,
+# flights and bookings whose codes are missing from airport_lookup are still
+# returned, with None for the city.
+AIRPORTS: Dict[str, str] = {}
+AIRPORT_RELOAD_INTERVAL = 60  # seconds between reloads triggered by unknown codes
+_airports_loaded_at = 0.0
+
+def load_airports():
+    global AIRPORTS, _airports_loaded_at
+    with get_read_db() as conn:
+        AIRPORTS = {
+            row["code"]: row["city_country"]
+            for row in conn.execute("SELECT code, city_country FROM airport_lookup")
+        }
+    _airports_loaded_at = time.monotonic()
+
+def airport_city(code: str) -> Optional[str]:
+    """city_country for an airport code, or None if airport_lookup lacks it.
+
+    An unknown code reloads the cache (at most once per AIRPORT_RELOAD_INTERVAL)
+    so airports added since startup resolve. The reload takes a pooled reader:
+    call this after releasing any connection you hold.
+    """
+    city = AIRPORTS.get(code)
+    if city is None and time.monotonic() - _airports_loaded_at > AIRPORT_RELOAD_INTERVAL:
+        load_airports()
+        city = AIRPORTS.get(code)
+    return city
+
+def make_pnr() -> str:
+    """Booking PNR: 'PNR' + 8 base32 chars from 40 bits of OS randomness"""
+    return "PNR" + base64.b32encode(os.urandom(5)).decode()
+
+# Simulated payment refs need uniqueness, not unpredictability: a Mersenne
+# Twister draw avoids a urandom syscall per checkout. Reseed after fork so
+# forked workers don't share one sequence (and collide on payment_reference).
+_payment_rng = random.Random()
+os.register_at_fork(after_in_child=_payment_rng.seed)
+
+def make_payment_reference() -> str:
+    """Payment reference: 'PAY_' + 16 hex chars from a non-cryptographic PRNG"""
+    return f"PAY_{_payment_rng.getrandbits(64):016X}"
+
 def calculate_refund(price_paid: float, departure_time: datetime) -> tuple[float, str]:
     """Calculate refund based on time until departure"""
     hours_until = (departure_time - datetime.now()).total_seconds() / 3600
@@ -518,7 +796,7 @@ def update_flight_inventory(conn, flight_id: int, seats_change: int):
         new_remaining, 
         flight["total_seats"], 
         demand_factor,
-        datetime.fromisoformat(flight["departure_time"])
+        _parse_iso(flight["departure_time"])
     )
     
     cur.execute("""
@@ -526,9 +804,21 @@ def update_flight_inventory(conn, flight_id: int, seats_change: int):
         VALUES (?, ?, ?, ?)
     """, (flight_id, new_price, demand_factor, new_remaining))
 
+# Authenticated users keyed by a digest of their access token (raw tokens are
+# never kept in memory); entries are also dropped once the token expires
+TOKEN_CACHE = TTLCache(maxsize=10_000, ttl=60)
+
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Validate JWT token and return user info"""
     token = credentials.credentials
+    cache_key = _token_cache_key(token)
+    cached = TOKEN_CACHE.get(cache_key)
+    if cached and cached[0] > time.time():
+        return dict(cached[1])
+    
     payload = decode_token(token)
     
     if not payload or payload.get("type") != "access":
@@ -542,15 +832,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
     
-    with get_db() as conn:
+    with get_read_db() as conn:
         cur = conn.cursor()
         cur.execute("SELECT id, username, role, is_active FROM user WHERE id = ?", (user_id,))
         user = cur.fetchone()
         
         if not user or not user["is_active"]:
             raise HTTPException(status_code=401, detail="User not found or inactive")
-        
-        return dict(user)
+    
+    user = dict(user)
+    TOKEN_CACHE[cache_key] = (payload["exp"], user)
+    return dict(user)
 
 def require_role(role: str):
     """Dependency to check user role"""
@@ -566,63 +858,107 @@ def require_role(role: str):
 # ---------------------------
 # PDF Generation (kept simple)
 # ---------------------------
-def generate_ticket_pdf(pnr: str, booking_details: Dict[str, Any]) -> str:
-    """Generate ticket PDF"""
-    file_path = f"ticket_{pnr}.pdf"
-    doc = SimpleDocTemplate(file_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    story.append(Paragraph("✈️ E-TICKET / BOARDING PASS", styles["Title"]))
-    story.append(Paragraph(f"PNR: {pnr}", styles["Heading2"]))
-    story.append(Spacer(1, 0.3*inch))
-    
-    data = [
-        ["Passenger", booking_details.get("passenger", "N/A")],
-        ["Flight", booking_details.get("flight_number", "N/A")],
-        ["From", booking_details.get("from_city", "N/A")],
-        ["To", booking_details.get("to_city", "N/A")],
-        ["Seat", booking_details.get("seat", "N/A")],
-        ["Date", booking_details.get("date", "N/A")]
-    ]
-    
-    t = Table(data, colWidths=[2*inch, 4*inch])
-    t.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('BACKGROUND', (0,0), (0,-1), colors.lightgrey)
-    ]))
-    story.append(t)
-    
-    doc.build(story)
-    return file_path
-
-def generate_cancellation_receipt(pnr: str, details: Dict[str, Any]) -> str:
-    """Generate cancellation receipt PDF"""
-    file_path = f"receipt_{pnr}.pdf"
-    doc = SimpleDocTemplate(file_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    story.append(Paragraph("❌ CANCELLATION RECEIPT", styles["Title"]))
-    story.append(Paragraph(f"PNR: {pnr}", styles["Heading2"]))
-    story.append(Spacer(1, 0.3*inch))
-    
-    data = [
-        ["Description", "Amount"],
-        ["Original Price", f"${details.get('price_paid', 0):.2f}"],
-        ["Refund Policy", details.get('policy', 'N/A')],
-        ["Refund Amount", f"${details.get('refund_amount', 0):.2f}"]
-    ]
-    
-    t = Table(data, colWidths=[3*inch, 2*inch])
-    t.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('BACKGROUND', (0,0), (-1,0), colors.lightcoral)
-    ]))
-    story.append(t)
-    
-    doc.build(story)
-    return file_path
+_STYLES = getSampleStyleSheet()
+
+TICKETS_DIR = Path(settings.tickets_dir)
+TICKETS_DIR.mkdir(parents=True, exist_ok=True)
+
+def _replace_atomically(file_path: Path, write):
+    """Write via a unique temp file and rename it over file_path"""
+    tmp_path = file_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, file_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+def _cached_pdf(file_path: Path, details: Dict[str, Any], build) -> tuple[str, str]:
+    """Return (file_path, digest of details), rebuilding only if details changed"""
+    digest = hashlib.sha256(json.dumps(details, sort_keys=True, default=str).encode()).hexdigest()
+    sidecar = file_path.with_suffix(".sha256")
+    if file_path.exists() and sidecar.exists() and sidecar.read_text() == digest:
+        return str(file_path), digest
+    
+    # Both files are swapped in atomically, PDF first: a concurrent check that
+    # sees the new PDF with the old sidecar just re-renders, and never pairs
+    # an old PDF with the new digest
+    _replace_atomically(file_path, lambda tmp: build(str(tmp)))
+    _replace_atomically(sidecar, lambda tmp: tmp.write_text(digest))
+    return str(file_path), digest
+
+# ReportLab rendering is CPU-bound; keep it off the event loop
+pdf_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pdf")
+atexit.register(pdf_pool.shutdown)
+
+async def render_pdf(generate, *args) -> tuple[str, str]:
+    """Run a PDF generator in the PDF thread pool and return (file path, digest)"""
+    return await asyncio.get_running_loop().run_in_executor(pdf_pool, generate, *args)
+
+def pdf_response(request: Request, pdf_path: str, digest: str, filename: str):
+    """Serve a cached PDF, answering 304 when the client already has this render"""
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(pdf_path, media_type="application/pdf", filename=filename, headers=headers)
+
+def generate_ticket_pdf(pnr: str, booking_details: Dict[str, Any]) -> tuple[str, str]:
+    """Generate ticket PDF (cached on disk per PNR)"""
+    def build(file_path: str):
+        doc = SimpleDocTemplate(file_path, pagesize=letter)
+        story = []
+        
+        story.append(Paragraph("✈️ E-TICKET / BOARDING PASS", _STYLES["Title"]))
+        story.append(Paragraph(f"PNR: {pnr}", _STYLES["Heading2"]))
+        story.append(Spacer(1, 0.3*inch))
+        
+        data = [
+            ["Passenger", booking_details.get("passenger", "N/A")],
+            ["Flight", booking_details.get("flight_number", "N/A")],
+            ["From", booking_details.get("from_city", "N/A")],
+            ["To", booking_details.get("to_city", "N/A")],
+            ["Seat", booking_details.get("seat", "N/A")],
+            ["Date", booking_details.get("date", "N/A")]
+        ]
+        
+        t = Table(data, colWidths=[2*inch, 4*inch])
+        t.setStyle(TableStyle([
+            ('GRID', (0,0), (-1,-1), 1, colors.black),
+            ('BACKGROUND', (0,0), (0,-1), colors.lightgrey)
+        ]))
+        story.append(t)
+        
+        doc.build(story)
+    
+    return _cached_pdf(TICKETS_DIR / f"{pnr}.pdf", booking_details, build)
+
+def generate_cancellation_receipt(pnr: str, details: Dict[str, Any]) -> tuple[str, str]:
+    """Generate cancellation receipt PDF (cached on disk per PNR)"""
+    def build(file_path: str):
+        doc = SimpleDocTemplate(file_path, pagesize=letter)
+        story = []
+        
+        story.append(Paragraph("❌ CANCELLATION RECEIPT", _STYLES["Title"]))
+        story.append(Paragraph(f"PNR: {pnr}", _STYLES["Heading2"]))
+        story.append(Spacer(1, 0.3*inch))
+        
+        data = [
+            ["Description", "Amount"],
+            ["Original Price", f"${details.get('price_paid', 0):.2f}"],
+            ["Refund Policy", details.get('policy', 'N/A')],
+            ["Refund Amount", f"${details.get('refund_amount', 0):.2f}"]
+        ]
+        
+        t = Table(data, colWidths=[3*inch, 2*inch])
+        t.setStyle(TableStyle([
+            ('GRID', (0,0), (-1,-1), 1, colors.black),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightcoral)
+        ]))
+        story.append(t)
+        
+        doc.build(story)
+    
+    return _cached_pdf(TICKETS_DIR / f"receipt_{pnr}.pdf", details, build)
 
 # ---------------------------
 # Background Jobs
@@ -630,55 +966,115 @@ def generate_cancellation_receipt(pnr: str, details: Dict[str, Any]) -> str:
 def cleanup_expired_bookings():
     """Cancel unpaid bookings after 15 minutes"""
     try:
-        with get_db() as conn:
+        with get_write_db() as conn:
             cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
             cutoff = (datetime.now() - timedelta(minutes=15)).isoformat()
             
+            # Seats held by expired bookings, grouped per flight
             cur.execute("""
-                SELECT id, flight_id FROM booking 
-                WHERE status = 'PENDING' AND booking_date < ?
+                SELECT b.flight_id, COUNT(p.id) as cnt
+                FROM booking b
+                JOIN passenger p ON p.booking_id = b.id
+                WHERE b.status = 'PENDING' AND b.booking_date < ?
+                GROUP BY b.flight_id
             """, (cutoff,))
             
-            expired = cur.fetchall()
-            for booking in expired:
-                cur.execute("SELECT COUNT(*) as cnt FROM passenger WHERE booking_id = ?", (booking["id"],))
-                count = cur.fetchone()["cnt"]
-                
-                # Restore seats
-                if count > 0:
-                    update_flight_inventory(conn, booking["flight_id"], count)
-                
-                # Cancel booking
-                cur.execute("UPDATE booking SET status = 'CANCELLED' WHERE id = ?", (booking["id"],))
+            # Restore seats (one inventory update per flight, not per booking)
+            for row in cur.fetchall():
+                update_flight_inventory(conn, row["flight_id"], row["cnt"])
+            
+            # Cancel bookings
+            cur.execute("""
+                UPDATE booking SET status = 'CANCELLED'
+                WHERE status = 'PENDING' AND booking_date < ?
+            """, (cutoff,))
+            expired = cur.rowcount
             
             conn.commit()
             if expired:
-                logger.info(f"Cleaned up {len(expired)} expired bookings")
+                logger.info(f"Cleaned up {expired} expired bookings")
     except Exception as e:
         logger.error(f"Error in cleanup job: {e}")
 
 def update_demand_factors():
     """Periodically update demand factors (simulation)"""
     try:
-        with get_db() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id FROM flight WHERE status = 'SCHEDULED'")
-            flights = [r[0] for r in cur.fetchall()]
-            
-            for fid in flights:
-                factor = round(random.uniform(0.95, 1.15), 2)
-                cur.execute("UPDATE flight SET demand_factor = ? WHERE id = ?", (factor, fid))
-            
-            conn.commit()
-            logger.info(f"Updated demand factors for {len(flights)} flights")
+        with get_write_db() as conn:
+            # Random factor in [0.95, 1.15] drawn per row by SQLite's random()
+            cur = conn.execute("""
+                UPDATE flight
+                SET demand_factor = ROUND(0.95 + (ABS(RANDOM()) % 201) / 1000.0, 2),
+                    updated_date = CURRENT_TIMESTAMP
+                WHERE status = 'SCHEDULED'
+            """)
+            logger.info(f"Updated demand factors for {cur.rowcount} flights")
     except Exception as e:
         logger.error(f"Error updating demand: {e}")
 
-scheduler = BackgroundScheduler()
-scheduler.add_job(func=cleanup_expired_bookings, trigger="interval", minutes=5)
-scheduler.add_job(func=update_demand_factors, trigger="interval", minutes=30)
-scheduler.start()
-atexit.register(lambda: scheduler.shutdown())
+def checkpoint_wal():
+    """Checkpoint and truncate the WAL file so it doesn't grow unbounded"""
+    try:
+        with get_write_db() as conn:
+            busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            if busy:
+                logger.warning(f"WAL checkpoint incomplete: {checkpointed}/{wal_pages} pages")
+    except Exception as e:
+        logger.error(f"Error checkpointing WAL: {e}")
+
+# Re-ANALYZE once this many bookings have been written since the last run
+ANALYZE_BOOKING_THRESHOLD = 1000
+# Rows sampled per index by ANALYZE, so a run holds the writer only briefly
+ANALYZE_ROW_LIMIT = 1000
+
+def _analyzed_booking_rows(conn) -> int:
+    """booking row count recorded in sqlite_stat1 by the last ANALYZE (0 if never)"""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        return 0
+    row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = 'booking' LIMIT 1").fetchone()
+    return int(row["stat"].split()[0]) if row else 0
+
+def analyze_database():
+    """Refresh query planner statistics when booking volume has moved enough"""
+    try:
+        with get_write_db() as conn:
+            # Bookings are never deleted, so MAX(id) tracks rows written; the
+            # watermark lives in sqlite_stat1 and survives restarts
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM booking").fetchone()[0]
+            if max_id - _analyzed_booking_rows(conn) < ANALYZE_BOOKING_THRESHOLD:
+                return
+            conn.execute(f"PRAGMA analysis_limit = {ANALYZE_ROW_LIMIT}")
+            conn.execute("ANALYZE")
+            logger.info(f"ANALYZE complete at booking id {max_id}")
+    except Exception as e:
+        logger.error(f"Error analyzing database: {e}")
+
+def add_background_jobs(scheduler):
+    scheduler.add_job(func=cleanup_expired_bookings, trigger="interval", minutes=5)
+    scheduler.add_job(func=update_demand_factors, trigger="interval", minutes=30)
+    scheduler.add_job(func=checkpoint_wal, trigger="interval", minutes=10)
+    scheduler.add_job(func=analyze_database, trigger="interval", hours=1)
+    return scheduler
+
+scheduler = add_background_jobs(BackgroundScheduler())
+
+# The in-process scheduler only starts with the server (never on import).
+# Multi-worker deployments set RUN_SCHEDULER=0 for web workers and run the
+# jobs once in a dedicated process: `python flight_api.py scheduler`
+@app.on_event("startup")
+def start_scheduler():
+    if settings.run_scheduler:
+        scheduler.start()
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    if scheduler.running:
+        scheduler.shutdown()
+
+def run_scheduler():
+    """Run the background jobs in the foreground (dedicated scheduler process)"""
+    logger.info("Starting background job scheduler...")
+    add_background_jobs(BlockingScheduler()).start()
 
 # ---------------------------
 # API ENDPOINTS
@@ -697,7 +1093,7 @@ def root():
 def health_check():
     """Health check endpoint"""
     try:
-        with get_db() as conn:
+        with get_read_db() as conn:
             conn.execute("SELECT 1")
         db_status = "healthy"
     except Exception as e:
@@ -707,7 +1103,7 @@ def health_check():
     return {
         "status": "ok" if db_status == "healthy" else "degraded",
         "database": db_status,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow()
     }
 
 # ---------------------------
@@ -720,8 +1116,12 @@ async def register(request: Request, user: UserRegister):
     """Register a new user"""
     logger.info(f"Registration attempt: {user.username}")
     
-    with get_db() as conn:
+    # Hash outside the writer lock and off the event loop
+    hashed_pwd = await run_in_threadpool(hash_password, user.password)
+    
+    with get_write_db() as conn:
         cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
         
         # Check if username or email exists
         cur.execute("SELECT id FROM user WHERE username = ? OR email = ?", 
@@ -730,7 +1130,6 @@ async def register(request: Request, user: UserRegister):
             raise HTTPException(400, "Username or email already exists")
         
         try:
-            hashed_pwd = hash_password(user.password)
             cur.execute("""
                 INSERT INTO user (username, password_hash, full_name, email, phone, country)
                 VALUES (?, ?, ?, ?, ?, ?)
@@ -759,33 +1158,36 @@ async def login(request: Request, credentials: UserLogin):
     """Login and get access token"""
     logger.info(f"Login attempt: {credentials.username}")
     
-    with get_db() as conn:
+    with get_read_db() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM user WHERE username = ?", (credentials.username.lower(),))
         user = cur.fetchone()
-        
-        if not user or not verify_password(credentials.password, user["password_hash"]):
-            logger.warning(f"Failed login attempt: {credentials.username}")
-            raise HTTPException(401, "Invalid credentials")
-        
-        if not user["is_active"]:
-            raise HTTPException(403, "Account is disabled")
-        
-        # Update last login
-        cur.execute("UPDATE user SET last_login = CURRENT_TIMESTAMP WHERE id = ?", (user["id"],))
+    
+    password_hash = user["password_hash"] if user else DUMMY_PASSWORD_HASH
+    password_ok = await run_in_threadpool(verify_password, credentials.password, password_hash)
+    if not user or not password_ok:
+        logger.warning(f"Failed login attempt: {credentials.username}")
+        raise HTTPException(401, "Invalid credentials")
+    
+    if not user["is_active"]:
+        raise HTTPException(403, "Account is disabled")
+    
+    # Update last login
+    with get_write_db() as conn:
+        conn.execute("UPDATE user SET last_login = CURRENT_TIMESTAMP WHERE id = ?", (user["id"],))
         conn.commit()
-        
-        # Generate tokens
-        access_token = create_access_token({"sub": str(user["id"]), "username": user["username"], "role": user["role"]})
-        refresh_token = create_refresh_token({"sub": str(user["id"])})
-        
-        logger.info(f"User logged in: {user['username']}")
-        
-        return TokenResponse(
-            access_token=access_token,
-            refresh_token=refresh_token,
-            expires_in=settings.access_token_expire_minutes * 60
-        )
+    
+    # Generate tokens
+    access_token = create_access_token({"sub": str(user["id"]), "username": user["username"], "role": user["role"]})
+    refresh_token = create_refresh_token({"sub": str(user["id"])})
+    
+    logger.info(f"User logged in: {user['username']}")
+    
+    return TokenResponse(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        expires_in=settings.access_token_expire_minutes * 60
+    )
 
 @app.post("/auth/refresh", response_model=TokenResponse, tags=["Authentication"])
 async def refresh_token(refresh_token: str):
@@ -797,7 +1199,7 @@ async def refresh_token(refresh_token: str):
     
     user_id = payload.get("sub")
     
-    with get_db() as conn:
+    with get_read_db() as conn:
         cur = conn.cursor()
         cur.execute("SELECT username, role FROM user WHERE id = ? AND is_active = 1", (user_id,))
         user = cur.fetchone()
@@ -818,6 +1220,42 @@ async def refresh_token(refresh_token: str):
 # Flight Management
 # ---------------------------
 
+# Short-lived response caches for popular reads, kept per process. An API write
+# clears them only in the worker that handled it; other gunicorn workers (and
+# changes made by the background jobs) can serve stale seats_remaining,
+# prices and stats for up to the TTL.
+SEARCH_CACHE = TTLCache(maxsize=1024, ttl=15)  # holds encoded JSON bodies
+STATS_CACHE = TTLCache(maxsize=1, ttl=30)
+
+def invalidate_response_caches():
+    """Drop this process's cached responses after a write it committed"""
+    SEARCH_CACHE.clear()
+    STATS_CACHE.clear()
+
+SEARCH_SORT_COLUMNS = {
+    "price": "current_price",
+    "departure": "f.departure_time",
+    "duration": "julianday(f.arrival_time) - julianday(f.departure_time)",
+}
+
+@lru_cache(maxsize=None)
+def search_flights_sql(origin: bool, destination: bool, date: bool, sort_by: str, order: str) -> str:
+    """Build the search statement for a filter combination.
+
+    Only the filters actually supplied are added (an "? IS NULL OR col = ?"
+    form would stop SQLite from using idx_flight_search), and every
+    combination maps to one interned string so the statement cache hits.
+    """
+    query = SQL_SEARCH_FLIGHTS_BASE
+    if origin:
+        query += " AND f.from_airport_code = ?"
+    if destination:
+        query += " AND f.to_airport_code = ?"
+    if date:
+        # Half-open range on the raw column keeps idx_flight_search usable
+        query += " AND f.departure_time >= ? AND f.departure_time < ?"
+    return query + f" ORDER BY {SEARCH_SORT_COLUMNS[sort_by]} {order.upper()} LIMIT ?"
+
 @app.get("/flights", tags=["Flights"])
 @limiter.limit("30/minute")
 async def search_flights(
@@ -825,98 +1263,68 @@ async def search_flights(
     origin: Optional[str] = Query(None, min_length=3, max_length=3),
     destination: Optional[str] = Query(None, min_length=3, max_length=3),
     date: Optional[str] = Query(None),
-    sort_by: str = Query("price", regex="^(price|departure|duration)$"),
-    order: str = Query("asc", regex="^(asc|desc)$")
+    sort_by: Literal["price", "departure", "duration"] = "price",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(100, ge=1, le=500)
 ):
     """Search flights with filters"""
-    with get_db() as conn:
-        cur = conn.cursor()
-        
-        query = """
-            SELECT f.*, 
-                   fa.city_country as from_city_country,
-                   ta.city_country as to_city_country
-            FROM flight f
-            JOIN airport_lookup fa ON fa.code = f.from_airport_code
-            JOIN airport_lookup ta ON ta.code = f.to_airport_code
-            WHERE f.status = 'SCHEDULED' AND f.seats_remaining > 0
-        """
-        params = []
-        
-        if origin:
-            query += " AND f.from_airport_code = ?"
-            params.append(origin.upper())
-        
-        if destination:
-            query += " AND f.to_airport_code = ?"
-            params.append(destination.upper())
-        
-        if date:
-            query += " AND DATE(f.departure_time) = DATE(?)"
-            params.append(date)
-        
-        # Only show future flights
-        query += " AND f.departure_time > datetime('now')"
-        
-        rows = cur.execute(query, params).fetchall()
-        
-        results = []
-        for row in rows:
-            r = dict(row)
-            departure_dt = datetime.fromisoformat(r["departure_time"])
-            r["current_price"] = calculate_dynamic_price(
-                r["base_price"],
-                r["seats_remaining"],
-                r["total_seats"],
-                r["demand_factor"],
-                departure_dt
-            )
-            results.append(r)
-        
-        # Sort results
-        if sort_by == "price":
-            results.sort(key=lambda x: x["current_price"], reverse=(order == "desc"))
-        elif sort_by == "departure":
-            results.sort(key=lambda x: x["departure_time"], reverse=(order == "desc"))
-        
-        logger.info(f"Flight search: {len(results)} results (origin={origin}, dest={destination})")
-        return {"count": len(results), "flights": results}
+    cache_key = (origin and origin.upper(), destination and destination.upper(), date, sort_by, order, limit)
+    cached = SEARCH_CACHE.get(cache_key)
+    if cached is not None:
+        return Response(cached, media_type="application/json")
+    
+    query = search_flights_sql(bool(origin), bool(destination), bool(date), sort_by, order)
+    params = []
+    if origin:
+        params.append(origin.upper())
+    if destination:
+        params.append(destination.upper())
+    if date:
+        try:
+            day = datetime.strptime(date[:10], "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(400, "Invalid date format. Use YYYY-MM-DD")
+        params += [day.strftime("%Y-%m-%d"), (day + timedelta(days=1)).strftime("%Y-%m-%d")]
+    params.append(limit)
+    
+    with get_read_db() as conn:
+        rows = conn.execute(query, params).fetchall()
+    
+    results = []
+    for row in rows:
+        r = dict(row)
+        r["from_city_country"] = airport_city(r["from_airport_code"])
+        r["to_city_country"] = airport_city(r["to_airport_code"])
+        results.append(r)
+    
+    logger.info(f"Flight search: {len(results)} results (origin={origin}, dest={destination})")
+    # Encode with orjson directly, skipping FastAPI's jsonable_encoder pass
+    response = ORJSONResponse({"count": len(results), "flights": results})
+    SEARCH_CACHE[cache_key] = response.body
+    return response
 
 @app.get("/flights/{flight_id}", tags=["Flights"])
 async def get_flight(flight_id: int):
     """Get flight details by ID"""
-    with get_db() as conn:
+    with get_read_db() as conn:
         cur = conn.cursor()
-        cur.execute("""
-            SELECT f.*,
-                   fa.city_country as from_city_country,
-                   ta.city_country as to_city_country
-            FROM flight f
-            JOIN airport_lookup fa ON fa.code = f.from_airport_code
-            JOIN airport_lookup ta ON ta.code = f.to_airport_code
-            WHERE f.id = ?
-        """, (flight_id,))
+        cur.execute(SQL_GET_FLIGHT, (flight_id,))
         
         flight = cur.fetchone()
-        if not flight:
-            raise HTTPException(404, "Flight not found")
-        
-        result = dict(flight)
-        departure_dt = datetime.fromisoformat(result["departure_time"])
-        result["current_price"] = calculate_dynamic_price(
-            result["base_price"],
-            result["seats_remaining"],
-            result["total_seats"],
-            result["demand_factor"],
-            departure_dt
-        )
-        
-        return result
+    
+    if not flight:
+        raise HTTPException(404, "Flight not found")
+    
+    result = dict(flight)
+    result["from_city_country"] = airport_city(result["from_airport_code"])
+    result["to_city_country"] = airport_city(result["to_airport_code"])
+    
+    return result
 
 @app.get("/flights/{flight_id}/seats", tags=["Flights"])
 async def get_seat_map(flight_id: int):
     """Get seat availability map"""
-    with get_db() as conn:
+    with get_read_db() as conn:
         cur = conn.cursor()
         
         cur.execute("SELECT total_seats, seats_remaining FROM flight WHERE id = ?", (flight_id,))
@@ -930,7 +1338,7 @@ async def get_seat_map(flight_id: int):
             WHERE flight_id = ?
         """, (flight_id,))
         
-        booked_seats = [dict(row) for row in cur.fetchall()]
+        booked_seats = [dict(row) for row in cur]
         
         return {
             "flight_id": flight_id,
@@ -945,13 +1353,13 @@ async def create_flight(flight: FlightCreate, user = Depends(get_current_user)):
     logger.info(f"Admin {user['username']} creating flight {flight.flight_number}")
     
     # Validate dates
-    departure = datetime.fromisoformat(flight.departure_time)
-    arrival = datetime.fromisoformat(flight.arrival_time)
+    departure = _parse_dt(flight.departure_time)
+    arrival = _parse_dt(flight.arrival_time)
     
     if arrival <= departure:
         raise HTTPException(400, "Arrival time must be after departure time")
     
-    with get_db() as conn:
+    with get_write_db() as conn:
         cur = conn.cursor()
         
         # Check if airport codes exist
@@ -974,6 +1382,7 @@ async def create_flight(flight: FlightCreate, user = Depends(get_current_user)):
             
             flight_id = cur.lastrowid
             conn.commit()
+            invalidate_response_caches()
             
             logger.info(f"Flight created: {flight.flight_number} (ID: {flight_id})")
             return {"message": "Flight created", "flight_id": flight_id}
@@ -990,7 +1399,7 @@ async def update_flight(flight_id: int, updates: Dict[str, Any], user = Depends(
     if not update_fields:
         raise HTTPException(400, "No valid fields to update")
     
-    with get_db() as conn:
+    with get_write_db() as conn:
         cur = conn.cursor()
         
         set_clause = ", ".join([f"{k} = ?" for k in update_fields.keys()])
@@ -1002,6 +1411,7 @@ async def update_flight(flight_id: int, updates: Dict[str, Any], user = Depends(
             raise HTTPException(404, "Flight not found")
         
         conn.commit()
+        invalidate_response_caches()
         logger.info(f"Flight {flight_id} updated by {user['username']}")
         return {"message": "Flight updated"}
 
@@ -1016,18 +1426,23 @@ async def checkout(request: Request, booking_req: BookingRequest):
     logger.info(f"Checkout attempt: user={booking_req.user_id}, flight={booking_req.flight_id}, passengers={len(booking_req.passengers)}")
     
     def do_checkout():
-        with get_db() as conn:
+        # Process payment (simulate) up front; a declined payment never
+        # needs the write lock or a rollback
+        payment_ref = make_payment_reference()
+        if random.random() <= 0.02:  # 98% success rate
+            logger.info(f"Payment failed: ref={payment_ref}, user={booking_req.user_id}")
+            raise HTTPException(402, "Payment failed. Please try again.")
+        
+        with get_write_db() as conn:
             cur = conn.cursor()
             cur.execute("BEGIN IMMEDIATE")
             
             try:
                 # Get flight details
                 cur.execute("""
-                    SELECT f.*, fa.city_country as from_city, ta.city_country as to_city
-                    FROM flight f
-                    JOIN airport_lookup fa ON fa.code = f.from_airport_code
-                    JOIN airport_lookup ta ON ta.code = f.to_airport_code
-                    WHERE f.id = ?
+                    SELECT status, departure_time, seats_remaining, total_seats, base_price, demand_factor
+                    FROM flight
+                    WHERE id = ?
                 """, (booking_req.flight_id,))
                 
                 flight = cur.fetchone()
@@ -1038,73 +1453,64 @@ async def checkout(request: Request, booking_req: BookingRequest):
                     raise HTTPException(400, f"Flight is {flight['status']}, cannot book")
                 
                 # Check departure time
-                departure_dt = datetime.fromisoformat(flight["departure_time"])
-                if departure_dt < datetime.now():
+                departure_ts = _parse_iso(flight["departure_time"])
+                if departure_ts < time.time():
                     raise HTTPException(400, "Cannot book past flights")
                 
                 # Check seat availability
                 if flight["seats_remaining"] < len(booking_req.passengers):
                     raise HTTPException(400, f"Only {flight['seats_remaining']} seats available")
                 
+                # Check requested seats in one indexed lookup (the write lock is
+                # already held, so nobody can take them before the inserts)
+                seats = [p.seat_number for p in booking_req.passengers]
+                if len(set(seats)) != len(seats):
+                    raise HTTPException(409, "Duplicate seat numbers in booking request")
+                cur.execute(f"""
+                    SELECT seat_number FROM passenger
+                    WHERE flight_id = ? AND seat_number IN ({",".join("?" * len(seats))})
+                """, (booking_req.flight_id, *seats))
+                taken = [row["seat_number"] for row in cur.fetchall()]
+                if taken:
+                    raise HTTPException(409, f"Seats already booked: {', '.join(taken)}")
+                
                 # Calculate price
                 price_per_passenger = calculate_dynamic_price(
                     flight["base_price"],
                     flight["seats_remaining"],
                     flight["total_seats"],
                     flight["demand_factor"],
-                    departure_dt
+                    departure_ts
                 )
                 total_price = round(price_per_passenger * len(booking_req.passengers), 2)
                 
                 # Generate PNR
-                pnr = "PNR" + uuid.uuid4().hex[:8].upper()
+                pnr = make_pnr()
                 
                 # Create booking
-                cur.execute("""
-                    INSERT INTO booking 
-                    (user_id, flight_id, pnr, price_paid, contact_email, contact_phone, status)
-                    VALUES (?, ?, ?, ?, ?, ?, 'PENDING')
-                """, (
+                cur.execute(SQL_INSERT_BOOKING, (
                     booking_req.user_id, booking_req.flight_id, pnr,
-                    total_price, booking_req.contact_email, booking_req.contact_phone
+                    total_price, booking_req.contact_email, booking_req.contact_phone,
+                    len(booking_req.passengers)
                 ))
                 
                 booking_id = cur.lastrowid
                 
                 # Insert passengers
-                for passenger in booking_req.passengers:
-                    try:
-                        cur.execute("""
-                            INSERT INTO passenger 
-                            (booking_id, flight_id, seat_number, seat_type, full_name, 
-                             date_of_birth, passport_number, passenger_type)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            booking_id, booking_req.flight_id, passenger.seat_number,
-                            passenger.seat_type, passenger.full_name, passenger.date_of_birth,
-                            passenger.passport_number, passenger.passenger_type
-                        ))
-                    except sqlite3.IntegrityError:
-                        raise HTTPException(409, f"Seat {passenger.seat_number} already booked")
+                cur.executemany(SQL_INSERT_PASSENGER, [
+                    (
+                        booking_id, booking_req.flight_id, p.seat_number,
+                        p.seat_type, p.full_name, p.date_of_birth,
+                        p.passport_number, p.passenger_type
+                    )
+                    for p in booking_req.passengers
+                ])
                 
                 # Update inventory
                 update_flight_inventory(conn, booking_req.flight_id, -len(booking_req.passengers))
                 
-                # Process payment (simulate)
-                payment_ref = "PAY_" + secrets.token_hex(8).upper()
-                payment_success = random.random() > 0.02  # 98% success rate
-                
-                payment_status = "SUCCESS" if payment_success else "FAILED"
-                
-                cur.execute("""
-                    INSERT INTO payment 
-                    (booking_id, payment_reference, payment_method, amount_paid, payment_status)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (booking_id, payment_ref, booking_req.payment_method, total_price, payment_status))
-                
-                if not payment_success:
-                    conn.rollback()
-                    raise HTTPException(402, "Payment failed. Please try again.")
+                # Record payment
+                cur.execute(SQL_INSERT_PAYMENT, (booking_id, payment_ref, booking_req.payment_method, total_price, "SUCCESS"))
                 
                 # Confirm booking
                 cur.execute("""
@@ -1114,6 +1520,7 @@ async def checkout(request: Request, booking_req: BookingRequest):
                 """, (payment_ref, booking_id))
                 
                 conn.commit()
+                invalidate_response_caches()
                 
                 logger.info(f"Booking successful: PNR={pnr}, booking_id={booking_id}")
                 
@@ -1126,7 +1533,7 @@ async def checkout(request: Request, booking_req: BookingRequest):
                     "message": "Booking confirmed successfully"
                 }
                 
-            except HTTPException:
+            except (HTTPException, sqlite3.OperationalError):
                 conn.rollback()
                 raise
             except Exception as e:
@@ -1134,52 +1541,73 @@ async def checkout(request: Request, booking_req: BookingRequest):
                 logger.error(f"Checkout error: {e}")
                 raise HTTPException(500, f"Booking failed: {str(e)}")
     
-    return with_retry(do_checkout)
+    return do_checkout()
+
+# Booking lists use keyset pagination on (booking_date, id): the cursor is the
+# last row's "booking_date|id", and the next page seeks past it in the index
+# instead of re-reading everything before it. id breaks same-second ties.
+def encode_booking_cursor(row) -> str:
+    return f"{row['booking_date']}|{row['id']}"
+
+def decode_booking_cursor(cursor: str) -> tuple[str, int]:
+    booking_date, _, booking_id = cursor.rpartition("|")
+    if not booking_date or not booking_id.isdigit():
+        raise HTTPException(400, "Invalid cursor")
+    return booking_date, int(booking_id)
 
 @app.get("/bookings/history/{user_id}", tags=["Bookings"])
-async def get_booking_history(user_id: int, user = Depends(get_current_user)):
-    """Get booking history for a user"""
+async def get_booking_history(
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    user = Depends(get_current_user)
+):
+    """Get booking history for a user, newest first"""
     # Users can only view their own history unless admin
     if user["role"] != "ADMIN" and user["id"] != user_id:
         raise HTTPException(403, "Cannot view other users' bookings")
     
-    with get_db() as conn:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT b.pnr, b.price_paid, b.booking_date, b.status,
-                   f.flight_number, f.airline, f.departure_time,
-                   fa.city_country as from_city,
-                   ta.city_country as to_city
-            FROM booking b
-            JOIN flight f ON f.id = b.flight_id
-            JOIN airport_lookup fa ON fa.code = f.from_airport_code
-            JOIN airport_lookup ta ON ta.code = f.to_airport_code
-            WHERE b.user_id = ?
-            ORDER BY b.booking_date DESC
-        """, (user_id,))
-        
-        bookings = [dict(row) for row in cur.fetchall()]
-        
-        return {
-            "user_id": user_id,
-            "count": len(bookings),
-            "bookings": bookings
-        }
+    query = """
+        SELECT b.id, b.pnr, b.price_paid, b.booking_date, b.status,
+               f.flight_number, f.airline, f.departure_time,
+               f.from_airport_code, f.to_airport_code
+        FROM booking b
+        JOIN flight f ON f.id = b.flight_id
+        WHERE b.user_id = ?
+    """
+    params = [user_id]
+    
+    if cursor:
+        query += " AND (b.booking_date, b.id) < (?, ?)"
+        params.extend(decode_booking_cursor(cursor))
+    
+    query += " ORDER BY b.booking_date DESC, b.id DESC LIMIT ?"
+    params.append(limit)
+    
+    with get_read_db() as conn:
+        rows = conn.execute(query, params).fetchall()
+    
+    bookings = []
+    for row in rows:
+        b = dict(row)
+        del b["id"]
+        b["from_city"] = airport_city(b.pop("from_airport_code"))
+        b["to_city"] = airport_city(b.pop("to_airport_code"))
+        bookings.append(b)
+    
+    return {
+        "user_id": user_id,
+        "count": len(bookings),
+        "bookings": bookings,
+        "next_cursor": encode_booking_cursor(rows[-1]) if len(rows) == limit else None
+    }
 
 @app.get("/bookings/{pnr}", tags=["Bookings"])
 async def get_booking(pnr: str, user = Depends(get_current_user)):
     """Get booking details by PNR"""
-    with get_db() as conn:
+    with get_read_db() as conn:
         cur = conn.cursor()
-        cur.execute("""
-            SELECT b.*, f.flight_number, f.airline, f.departure_time, f.arrival_time,
-                   fa.city_country as from_city, ta.city_country as to_city
-            FROM booking b
-            JOIN flight f ON f.id = b.flight_id
-            JOIN airport_lookup fa ON fa.code = f.from_airport_code
-            JOIN airport_lookup ta ON ta.code = f.to_airport_code
-            WHERE b.pnr = ?
-        """, (pnr,))
+        cur.execute(SQL_GET_BOOKING_BY_PNR, (pnr,))
         
         booking = cur.fetchone()
         if not booking:
@@ -1197,22 +1625,23 @@ async def get_booking(pnr: str, user = Depends(get_current_user)):
             FROM passenger WHERE booking_id = ?
         """, (booking["id"],))
         result["passengers"] = [dict(row) for row in cur.fetchall()]
-        
-        return result
+    
+    result["from_city"] = airport_city(result.pop("from_airport_code"))
+    result["to_city"] = airport_city(result.pop("to_airport_code"))
+    
+    return result
 
 @app.get("/bookings/ticket/{pnr}", tags=["Bookings"])
-async def download_ticket(pnr: str, user = Depends(get_current_user)):
+async def download_ticket(request: Request, pnr: str, user = Depends(get_current_user)):
     """Download ticket PDF for confirmed booking"""
-    with get_db() as conn:
+    with get_read_db() as conn:
         cur = conn.cursor()
         cur.execute("""
             SELECT b.*, f.flight_number, f.airline, f.departure_time,
-                   fa.city_country as from_city, ta.city_country as to_city,
+                   f.from_airport_code, f.to_airport_code,
                    p.full_name as passenger_name, p.seat_number
             FROM booking b
             JOIN flight f ON f.id = b.flight_id
-            JOIN airport_lookup fa ON fa.code = f.from_airport_code
-            JOIN airport_lookup ta ON ta.code = f.to_airport_code
             JOIN passenger p ON p.booking_id = b.id
             WHERE b.pnr = ? AND b.status = 'CONFIRMED'
             LIMIT 1
@@ -1226,31 +1655,32 @@ async def download_ticket(pnr: str, user = Depends(get_current_user)):
         if user["role"] != "ADMIN" and booking["user_id"] != user["id"]:
             raise HTTPException(403, "Unauthorized")
         
-        details = {
-            "passenger": booking["passenger_name"],
-            "flight_number": booking["flight_number"],
-            "from_city": booking["from_city"],
-            "to_city": booking["to_city"],
-            "seat": booking["seat_number"],
-            "date": booking["departure_time"].split()[0]
-        }
-        
-        pdf_path = generate_ticket_pdf(pnr, details)
-        return FileResponse(pdf_path, media_type="application/pdf", filename=f"ticket_{pnr}.pdf")
+    details = {
+        "passenger": booking["passenger_name"],
+        "flight_number": booking["flight_number"],
+        "from_city": airport_city(booking["from_airport_code"]),
+        "to_city": airport_city(booking["to_airport_code"]),
+        "seat": booking["seat_number"],
+        "date": booking["departure_time"].split()[0]
+    }
+    
+    pdf_path, digest = await render_pdf(generate_ticket_pdf, pnr, details)
+    return pdf_response(request, pdf_path, digest, f"ticket_{pnr}.pdf")
 
 @app.post("/bookings/cancel/{pnr}", tags=["Bookings"])
 async def cancel_booking(pnr: str, reason: Optional[str] = "User requested", user = Depends(get_current_user)):
     """Cancel a confirmed booking"""
     logger.info(f"Cancellation request: PNR={pnr}, user={user['username']}")
     
-    with get_db() as conn:
+    with get_write_db() as conn:
         cur = conn.cursor()
         cur.execute("BEGIN IMMEDIATE")
         
         try:
             # Get booking
             cur.execute("""
-                SELECT b.*, f.departure_time
+                SELECT b.id, b.user_id, b.flight_id, b.status, b.price_paid, b.passenger_count,
+                       f.departure_time
                 FROM booking b
                 JOIN flight f ON f.id = b.flight_id
                 WHERE b.pnr = ?
@@ -1268,13 +1698,9 @@ async def cancel_booking(pnr: str, reason: Optional[str] = "User requested", use
                 raise HTTPException(400, "Only confirmed bookings can be cancelled")
             
             # Calculate refund
-            departure_dt = datetime.fromisoformat(booking["departure_time"])
+            departure_dt = _parse_dt(booking["departure_time"])
             refund_amount, refund_policy = calculate_refund(booking["price_paid"], departure_dt)
             
-            # Count passengers
-            cur.execute("SELECT COUNT(*) as cnt FROM passenger WHERE booking_id = ?", (booking["id"],))
-            passenger_count = cur.fetchone()["cnt"]
-            
             # Archive cancellation
             cur.execute("""
                 INSERT INTO cancelled_booking 
@@ -1299,29 +1725,30 @@ async def cancel_booking(pnr: str, reason: Optional[str] = "User requested", use
             """, (booking["id"],))
             
             # Restore seats
-            update_flight_inventory(conn, booking["flight_id"], passenger_count)
+            update_flight_inventory(conn, booking["flight_id"], booking["passenger_count"])
             
             conn.commit()
+            invalidate_response_caches()
             
             logger.info(f"Booking cancelled: PNR={pnr}, refund=${refund_amount}")
             
-            # Generate receipt
-            receipt_details = {
-                "price_paid": booking["price_paid"],
-                "refund_amount": refund_amount,
-                "policy": refund_policy
-            }
-            
-            pdf_path = generate_cancellation_receipt(pnr, receipt_details)
-            return FileResponse(pdf_path, media_type="application/pdf", filename=f"receipt_{pnr}.pdf")
-            
-        except HTTPException:
+        except (HTTPException, sqlite3.OperationalError):
             conn.rollback()
             raise
         except Exception as e:
             conn.rollback()
             logger.error(f"Cancellation error: {e}")
             raise HTTPException(500, f"Cancellation failed: {str(e)}")
+    
+    # Generate receipt (after the write lock is released)
+    receipt_details = {
+        "price_paid": booking["price_paid"],
+        "refund_amount": refund_amount,
+        "policy": refund_policy
+    }
+    
+    pdf_path, _ = await render_pdf(generate_cancellation_receipt, pnr, receipt_details)
+    return FileResponse(pdf_path, media_type="application/pdf", filename=f"receipt_{pnr}.pdf")
 
 # ---------------------------
 # Admin Endpoints
@@ -1329,15 +1756,18 @@ async def cancel_booking(pnr: str, reason: Optional[str] = "User requested", use
 
 @app.get("/admin/bookings", tags=["Admin"], dependencies=[Depends(require_role("ADMIN"))])
 async def get_all_bookings(
-    status: Optional[str] = Query(None, regex="^(PENDING|CONFIRMED|CANCELLED)$"),
+    status: Optional[Literal["PENDING", "CONFIRMED", "CANCELLED"]] = None,
+    cursor: Optional[str] = None,
     limit: int = Query(50, ge=1, le=500)
 ):
     """Get all bookings (Admin only)"""
-    with get_db() as conn:
+    with get_read_db() as conn:
         cur = conn.cursor()
         
         query = """
-            SELECT b.*, u.username, f.flight_number
+            SELECT b.id, b.pnr, b.user_id, u.username, b.flight_id, f.flight_number,
+                   b.price_paid, b.booking_date, b.status, b.payment_reference,
+                   b.contact_email, b.contact_phone, b.cancellation_date, b.refund_amount
             FROM booking b
             JOIN user u ON u.id = b.user_id
             JOIN flight f ON f.id = b.flight_id
@@ -1349,46 +1779,57 @@ async def get_all_bookings(
             query += " AND b.status = ?"
             params.append(status)
         
-        query += " ORDER BY b.booking_date DESC LIMIT ?"
+        if cursor:
+            query += " AND (b.booking_date, b.id) < (?, ?)"
+            params.extend(decode_booking_cursor(cursor))
+        
+        query += " ORDER BY b.booking_date DESC, b.id DESC LIMIT ?"
         params.append(limit)
         
-        cur.execute(query, params)
-        bookings = [dict(row) for row in cur.fetchall()]
+        bookings = [dict(row) for row in cur.execute(query, params)]
         
-        return {"count": len(bookings), "bookings": bookings}
+        return {
+            "count": len(bookings),
+            "bookings": bookings,
+            "next_cursor": encode_booking_cursor(bookings[-1]) if len(bookings) == limit else None
+        }
 
 @app.get("/admin/stats", tags=["Admin"], dependencies=[Depends(require_role("ADMIN"))])
 async def get_stats():
     """Get system statistics (Admin only)"""
-    with get_db() as conn:
-        cur = conn.cursor()
-        
-        cur.execute("SELECT COUNT(*) as total FROM booking WHERE status = 'CONFIRMED'")
-        total_bookings = cur.fetchone()["total"]
-        
-        cur.execute("SELECT SUM(price_paid) as revenue FROM booking WHERE status = 'CONFIRMED'")
-        total_revenue = cur.fetchone()["revenue"] or 0
-        
-        cur.execute("SELECT COUNT(*) as total FROM flight WHERE status = 'SCHEDULED'")
-        total_flights = cur.fetchone()["total"]
-        
-        cur.execute("SELECT COUNT(*) as total FROM user WHERE is_active = 1")
-        total_users = cur.fetchone()["total"]
+    cached = STATS_CACHE.get("stats")
+    if cached is not None:
+        return cached
+    
+    with get_read_db() as conn:
+        row = conn.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM booking WHERE status = 'CONFIRMED') AS total_bookings,
+                (SELECT COALESCE(SUM(price_paid), 0) FROM booking WHERE status = 'CONFIRMED') AS total_revenue,
+                (SELECT COUNT(*) FROM flight WHERE status = 'SCHEDULED') AS total_flights,
+                (SELECT COUNT(*) FROM user WHERE is_active = 1) AS total_users
+        """).fetchone()
         
-        return {
-            "total_bookings": total_bookings,
-            "total_revenue": round(total_revenue, 2),
-            "total_flights": total_flights,
-            "total_users": total_users
+        stats = STATS_CACHE["stats"] = {
+            "total_bookings": row["total_bookings"],
+            "total_revenue": round(row["total_revenue"], 2),
+            "total_flights": row["total_flights"],
+            "total_users": row["total_users"]
         }
+        return stats
 
 # ---------------------------
 # Run Application
 # ---------------------------
 if __name__ == "__main__":
-    import uvicorn
-    logger.info("Starting Flight Booking API...")
-    uvicorn.run("flight_api_production:app", host="0.0.0.0", port=8000, reload=True)
+    import sys
+    if sys.argv[1:] == ["scheduler"]:
+        run_scheduler()
+    else:
+        import uvicorn
+        logger.info("Starting Flight Booking API...")
+        uvicorn.run("flight_api:app", host="0.0.0.0", port=8000, reload=True,
+                    loop="uvloop", http="httptools")
 import sqlite3
 
 conn = sqlite3.connect("db.sqlite", check_same_thread=False)
@@ -0,0 +1,26 @@
+# gunicorn_conf.py
+"""
+Production server configuration.
+
+Run from the backend directory:
+    gunicorn -c gunicorn_conf.py flight_api:app
+
+Web workers are started with RUN_SCHEDULER=0; run the background jobs in a
+single dedicated process instead of once per worker:
+    python flight_api.py scheduler
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+
+# UvicornWorker uses uvloop and the httptools parser when installed (uvicorn[standard])
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# No preload_app: importing flight_api opens the SQLite connection pool, and
+# SQLite connections must not be carried across fork(). Each worker imports
+# the app itself and opens its own connections.
+
+raw_env = ["RUN_SCHEDULER=0"]
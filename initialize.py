@@ -24,6 +24,14 @@ def initialize_database():
             cursor.executescript(sql_script)
             conn.commit()
 
+            # WAL lets readers run alongside the writer; NORMAL sync is safe under WAL
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+
+            # Give the query planner statistics for the freshly loaded data
+            cursor.execute("ANALYZE")
+            cursor.execute("PRAGMA optimize")
+
             print(f"Database '{DATABASE_NAME}' created and populated successfully.")
 
     except sqlite3.OperationalError as e: